@@ -2,47 +2,106 @@
 Simplified FastAPI Application for Testing
 """
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from datetime import datetime
+import asyncio
 import os
+import time
+import orjson
 
-app = FastAPI(title="Reliability Engineering Demo - Simplified")
+app = FastAPI(title="Reliability Engineering Demo - Simplified", default_response_class=ORJSONResponse)
+
+# Static payloads are serialized once at import time
+_ROOT_BYTES = orjson.dumps({"message": "Reliability Engineering Demo", "version": "2.0", "status": "running"})
+_FAST_BYTES = orjson.dumps({"data": "fast response", "latency": "< 10ms"})
+_SERVICES = {
+    "redis": "not_checked",
+    "database": "not_checked"
+}
+
+# /health body cached per wall-clock second: [epoch_second, json_bytes]
+_health_cache = [0, b""]
+
+# /metrics exposition cached for one second: [monotonic_time, text_bytes]
+_START_TIME = time.time()
+_metrics_cache = [float("-inf"), b""]
+
+def _render_metrics() -> bytes:
+    """Render metrics in Prometheus text exposition format"""
+    return (
+        "# HELP app_info Application version information\n"
+        "# TYPE app_info gauge\n"
+        'app_info{version="2.0"} 1\n'
+        "# HELP app_uptime_seconds Seconds since the process started\n"
+        "# TYPE app_uptime_seconds gauge\n"
+        f"app_uptime_seconds {time.time() - _START_TIME:.0f}\n"
+    ).encode()
+
+class FastShortcut:
+    """ASGI middleware answering GET /api/fast before FastAPI routing runs"""
+
+    def __init__(self, app):
+        self.app = app
+        self._headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(_FAST_BYTES)).encode())
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/api/fast" and scope["method"] == "GET":
+            await send({"type": "http.response.start", "status": 200, "headers": self._headers})
+            await send({"type": "http.response.body", "body": _FAST_BYTES})
+            return
+        await self.app(scope, receive, send)
+
+app.add_middleware(FastShortcut)
 
 @app.get("/")
 async def root():
-    return {"message": "Reliability Engineering Demo", "version": "2.0", "status": "running"}
+    return Response(_ROOT_BYTES, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "services": {
-            "redis": "not_checked",
-            "database": "not_checked"
-        }
-    }
+    now = int(time.time())
+    if now != _health_cache[0]:
+        _health_cache[1] = orjson.dumps({
+            "status": "healthy",
+            "timestamp": datetime.utcfromtimestamp(now).isoformat(),
+            "services": _SERVICES
+        })
+        _health_cache[0] = now
+    return Response(_health_cache[1], media_type="application/json")
 
+# Served by FastShortcut; the route is kept so /api/fast stays in the OpenAPI schema
 @app.get("/api/fast")
 async def fast_endpoint():
-    return {"data": "fast response", "latency": "< 10ms"}
+    return Response(_FAST_BYTES, media_type="application/json")
 
 @app.get("/api/medium")
 async def medium_endpoint():
-    import asyncio
     await asyncio.sleep(0.05)
     return {"data": "medium response", "latency": "~50ms"}
 
 @app.get("/api/slow")
 async def slow_endpoint():
-    import asyncio
     await asyncio.sleep(0.2)
     return {"data": "slow response", "latency": "~200ms"}
 
 @app.get("/metrics")
 async def metrics():
-    return {"metrics": "simplified"}
+    now = time.monotonic()
+    if now - _metrics_cache[0] >= 1.0:
+        _metrics_cache[1] = _render_metrics()
+        _metrics_cache[0] = now
+    return Response(_metrics_cache[1], media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    )
\ No newline at end of file
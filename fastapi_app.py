@@ -209,6 +209,16 @@ async def redis_set(key: str, value: str, redis=Depends(get_redis)):
         ERROR_COUNT.labels(type="redis_error").inc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/redis/{key}/incr")
+async def redis_incr(key: str, redis=Depends(get_redis)):
+    """Redis INCR operation (atomic)"""
+    try:
+        value = await redis.incr(key)
+        return {"key": key, "value": value}
+    except Exception as e:
+        ERROR_COUNT.labels(type="redis_error").inc()
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/db/reservations")
 async def get_reservations(db: AsyncSession = Depends(get_db)):
     """Get all reservations"""
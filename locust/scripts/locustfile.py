@@ -2,24 +2,16 @@
 Locust Load Testing - Comprehensive User Behavior Simulation
 Target: Realistic user patterns with weighted scenarios
 """
-from locust import HttpUser, task, between, events
+from locust import task, between, events
+from locust.contrib.fasthttp import FastHttpUser
+import gevent
 import random
-import json
 import logging
 
-# Configure logging
+# Configure logging (under the locust CLI the level comes from --loglevel / LOCUST_LOGLEVEL)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global statistics
-stats = {
-    "total_requests": 0,
-    "successful_requests": 0,
-    "failed_requests": 0,
-    "redis_ops": 0,
-    "db_ops": 0,
-}
-
 @events.test_start.add_listener
 def on_test_start(environment, **kwargs):
     """Test start event"""
@@ -28,10 +20,13 @@ def on_test_start(environment, **kwargs):
 @events.test_stop.add_listener
 def on_test_stop(environment, **kwargs):
     """Test stop event - print final statistics"""
+    total = environment.stats.total
     logger.info("🏁 Locust Load Test Completed")
-    logger.info(f"📊 Statistics: {json.dumps(stats, indent=2)}")
+    logger.info("📊 Statistics: %d requests, %d failures", total.num_requests, total.num_failures)
+    for (name, method), entry in environment.stats.entries.items():
+        logger.info("   %s %s: %d requests, %d failures", method, name, entry.num_requests, entry.num_failures)
 
-class ReliabilityTestUser(HttpUser):
+class ReliabilityTestUser(FastHttpUser):
     """
     Simulates realistic user behavior
     Multiple task types with different weights
@@ -40,62 +35,35 @@ class ReliabilityTestUser(HttpUser):
     
     def on_start(self):
         """Initialize user session"""
-        self.user_id = f"user_{random.randint(1000, 9999)}"
-        logger.info(f"👤 User {self.user_id} started session")
+        self._rand = random.Random()
+        self.user_id = f"user_{self._rand.randrange(1000, 10000)}"
+        logger.info("👤 User %s started session", self.user_id)
     
     @task(30)
     def browse_homepage(self):
         """Browse homepage (30% of traffic)"""
-        with self.client.get("/", catch_response=True) as response:
-            stats["total_requests"] += 1
-            if response.status_code == 200:
-                stats["successful_requests"] += 1
-                response.success()
-            else:
-                stats["failed_requests"] += 1
-                response.failure(f"Got {response.status_code}")
+        self.client.get("/")
     
     @task(25)
     def fast_api_request(self):
         """Fast API endpoint (25% of traffic)"""
-        with self.client.get("/api/fast", catch_response=True) as response:
-            stats["total_requests"] += 1
-            if response.status_code == 200:
-                stats["successful_requests"] += 1
-                response.success()
-            else:
-                stats["failed_requests"] += 1
-                response.failure(f"Got {response.status_code}")
+        self.client.get("/api/fast")
     
     @task(20)
     def medium_api_request(self):
         """Medium API endpoint (20% of traffic)"""
-        with self.client.get("/api/medium", catch_response=True) as response:
-            stats["total_requests"] += 1
-            if response.status_code == 200:
-                stats["successful_requests"] += 1
-                response.success()
-            else:
-                stats["failed_requests"] += 1
-                response.failure(f"Got {response.status_code}")
+        self.client.get("/api/medium")
     
     @task(10)
     def slow_api_request(self):
         """Slow API endpoint (10% of traffic)"""
-        with self.client.get("/api/slow", catch_response=True) as response:
-            stats["total_requests"] += 1
-            if response.status_code == 200:
-                stats["successful_requests"] += 1
-                response.success()
-            else:
-                stats["failed_requests"] += 1
-                response.failure(f"Got {response.status_code}")
+        self.client.get("/api/slow")
     
     @task(10)
     def redis_operations(self):
         """Redis SET/GET operations (10% of traffic)"""
-        key = f"test_key_{random.randint(1, 1000)}"
-        value = f"test_value_{random.randint(1, 10000)}"
+        key = f"test_key_{self._rand.randrange(1024)}"
+        value = f"test_value_{self._rand.randrange(16384)}"
         
         # SET operation
         with self.client.post(
@@ -103,44 +71,28 @@ class ReliabilityTestUser(HttpUser):
             params={"value": value},
             catch_response=True
         ) as response:
-            stats["total_requests"] += 1
-            stats["redis_ops"] += 1
             if response.status_code == 200:
-                stats["successful_requests"] += 1
                 response.success()
             else:
-                stats["failed_requests"] += 1
                 response.failure(f"Redis SET failed: {response.status_code}")
         
         # GET operation
         with self.client.get(f"/api/redis/{key}", catch_response=True) as response:
-            stats["total_requests"] += 1
-            stats["redis_ops"] += 1
             if response.status_code == 200:
-                stats["successful_requests"] += 1
                 response.success()
             else:
                 # 404 is acceptable (key might have expired)
                 if response.status_code == 404:
                     response.success()
                 else:
-                    stats["failed_requests"] += 1
                     response.failure(f"Redis GET failed: {response.status_code}")
     
     @task(5)
     def database_operations(self):
         """Database operations (5% of traffic)"""
-        with self.client.get("/api/db/reservations", catch_response=True) as response:
-            stats["total_requests"] += 1
-            stats["db_ops"] += 1
-            if response.status_code == 200:
-                stats["successful_requests"] += 1
-                response.success()
-            else:
-                stats["failed_requests"] += 1
-                response.failure(f"DB query failed: {response.status_code}")
+        self.client.get("/api/db/reservations")
 
-class HeavyUser(HttpUser):
+class HeavyUser(FastHttpUser):
     """
     Heavy user - generates more load
     Used for stress testing specific scenarios
@@ -150,12 +102,11 @@ class HeavyUser(HttpUser):
     
     @task
     def heavy_load(self):
-        """Batch requests"""
+        """Batch requests (issued concurrently, latency = slowest endpoint)"""
         endpoints = ["/api/fast", "/api/medium", "/"]
-        for endpoint in endpoints:
-            self.client.get(endpoint)
+        gevent.joinall([gevent.spawn(self.client.get, endpoint) for endpoint in endpoints])
 
-class ChaosUser(HttpUser):
+class ChaosUser(FastHttpUser):
     """
     Chaos user - occasionally triggers error scenarios
     Used to test error handling
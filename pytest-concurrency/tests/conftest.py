@@ -0,0 +1,18 @@
+"""
+Shared pytest configuration for the concurrency tests
+"""
+import asyncio
+import pytest
+
+@pytest.fixture(autouse=True)
+def eager_task_factory(event_loop):
+    """
+    Run new tasks eagerly until their first real suspension
+    
+    Coroutines that complete their first await synchronously (ready pooled
+    sockets) skip a trip through the event loop when gathered.
+    Requires Python 3.12+; older interpreters keep the default factory.
+    """
+    factory = getattr(asyncio, "eager_task_factory", None)
+    if factory is not None:
+        event_loop.set_task_factory(factory)